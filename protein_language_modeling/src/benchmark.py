@@ -0,0 +1,361 @@
+import argparse
+import contextlib
+from datetime import datetime, timezone
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+import pandas as pd
+import torch
+from esm.sdk.api import ESMProtein
+from esm.utils.structure.protein_chain import ProteinChain
+from data import ProteinDataset
+from interfaces import ProteinPredictionReturnType, ProteinPredictionTask
+from models import ESM3Model, TieredProteinLanguageModel
+from stand_ins import RandomESM3InferenceClient, random_esm2_model
+from utils import ProteinComparator, ProteinComparatorMethod
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(PROJECT_ROOT, "data", "fixtures")
+MUTATION_MANIFEST_PATH = os.path.join(PROJECT_ROOT, "data", "thermomutdb_alphafold_investigation.csv")
+
+def time_function(function: Callable[[], Any], repeats: int = 5, warmup: int = 1, items: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        function()
+
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    mean_s = statistics.mean(durations)
+    return {
+        "repeats": repeats,
+        "items": items,
+        "mean_s": mean_s,
+        "median_s": statistics.median(durations),
+        "min_s": min(durations),
+        "max_s": max(durations),
+        "stdev_s": statistics.stdev(durations) if len(durations) > 1 else 0.0,
+        "items_per_s": items / mean_s if mean_s > 0 else None,
+    }
+
+def read_fixture(filename: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, filename), "r") as fixture_file:
+        return fixture_file.read()
+
+def mutant_sequences(wild_type_sequence: str, n_samples: int) -> List[str]:
+    """Apply the first `n_samples` ThermoMutDB mutations to the fixture sequence,
+    wrapping the mutation positions around its length."""
+    manifest = pd.read_csv(MUTATION_MANIFEST_PATH, nrows=n_samples)
+    sequences = []
+    for mutation_code in manifest["MUTATION_uniprot"]:
+        position = (int(mutation_code[1:-1]) - 1) % len(wild_type_sequence)
+        sequences.append(wild_type_sequence[:position] + mutation_code[-1] + wild_type_sequence[position + 1:])
+    return sequences
+
+def benchmark_dataset(results: Dict[str, Any], n_samples: int, repeats: int):
+    reference_pdb = read_fixture("helix_reference.pdb")
+    df = pd.read_csv(MUTATION_MANIFEST_PATH, nrows=n_samples)
+    df["real_pdb_wild"] = reference_pdb
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        for extension in ["csv", "json"]:
+            filepath = os.path.join(scratch_dir, f"dataset.{extension}")
+            ProteinDataset(filepath, df_override=df).save(filepath)
+
+            results[f"dataset.load.{extension}"] = time_function(
+                lambda: ProteinDataset(filepath),
+                repeats=repeats,
+                items=n_samples,
+            )
+
+            dataset = ProteinDataset(filepath)
+            results[f"dataset.getitem.{extension}"] = time_function(
+                lambda: [dataset[idx] for idx in range(len(dataset))],
+                repeats=repeats,
+                items=len(dataset),
+            )
+
+def benchmark_pdb_parsing(results: Dict[str, Any], repeats: int):
+    reference_pdb = read_fixture("helix_reference.pdb")
+    reference_path = os.path.join(FIXTURES_DIR, "helix_reference.pdb")
+
+    results["pdb.protein_chain.from_pdb"] = time_function(
+        lambda: ProteinChain.from_pdb(reference_path),
+        repeats=repeats,
+    )
+    results["pdb.esm_protein.from_pdb"] = time_function(
+        lambda: ESMProtein.from_pdb(io.StringIO(reference_pdb)),
+        repeats=repeats,
+    )
+
+def executable_exists(method: ProteinComparatorMethod) -> bool:
+    # Constructing a comparator downloads and compiles missing executables,
+    # which must not happen in an offline benchmark
+    if method == ProteinComparatorMethod.US_ALIGN:
+        return os.path.exists("USalign")
+    elif method == ProteinComparatorMethod.TM_ALIGN:
+        return os.path.exists("TMalign")
+    return True
+
+def benchmark_comparators(results: Dict[str, Any], n_samples: int, repeats: int):
+    predicted_pdb = read_fixture("helix_perturbed.pdb")
+    reference_pdb = read_fixture("helix_reference.pdb")
+
+    for method in ProteinComparatorMethod:
+        if method == ProteinComparatorMethod.ALL:
+            continue
+
+        key = f"comparator.{method.name.lower()}"
+        if not executable_exists(method):
+            results[key] = { "skipped": "executable not found" }
+            continue
+
+        try:
+            comparator = ProteinComparator(method=method)
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[key] = time_function(
+                    lambda: comparator.compute_score_and_alignment(predicted_pdb, reference_pdb),
+                    repeats=repeats,
+                )
+        except Exception as e:
+            results[key] = { "error": repr(e) }
+
+    if executable_exists(ProteinComparatorMethod.US_ALIGN):
+        comparator = ProteinComparator(method=ProteinComparatorMethod.US_ALIGN)
+        results["comparator.us_align.batch"] = time_function(
+            lambda: comparator.compute_scores_batch([(predicted_pdb, reference_pdb)] * n_samples),
+            repeats=repeats,
+            items=n_samples,
+        )
+    else:
+        results["comparator.us_align.batch"] = { "skipped": "executable not found" }
+
+def benchmark_model(results: Dict[str, Any], model: ESM3Model, sequences: List[str], batch_sizes: List[int], num_steps: int, repeats: int):
+    generation_config_kwargs = { "num_steps": num_steps, "temperature": 0.0 }
+
+    results["model.structure_prediction.single"] = time_function(
+        lambda: model(
+            ProteinPredictionTask.STRUCTURE_PREDICTION,
+            protein=sequences[0],
+            generation_config_kwargs=generation_config_kwargs,
+        ),
+        repeats=repeats,
+    )
+
+    for batch_size in batch_sizes:
+        batch = (sequences * batch_size)[:batch_size]
+        results[f"model.structure_prediction.batch_{batch_size}"] = time_function(
+            lambda: model.batch_call(
+                ProteinPredictionTask.STRUCTURE_PREDICTION,
+                batch,
+                generation_config_kwargs=generation_config_kwargs,
+            ),
+            repeats=repeats,
+            items=batch_size,
+        )
+
+    # A long target, predicted whole and as overlapping windows
+    long_sequence = "".join(sequences[:4])
+    results["model.structure_prediction.long"] = time_function(
+        lambda: model(
+            ProteinPredictionTask.STRUCTURE_PREDICTION,
+            protein=long_sequence,
+            generation_config_kwargs=generation_config_kwargs,
+        ),
+        repeats=repeats,
+    )
+    results["model.structure_prediction.long_windowed"] = time_function(
+        lambda: model(
+            ProteinPredictionTask.STRUCTURE_PREDICTION,
+            protein=long_sequence,
+            generation_config_kwargs=generation_config_kwargs,
+            windowing_kwargs={ "window_size": 64, "window_overlap": 16 },
+        ),
+        repeats=repeats,
+    )
+    results["model.structure_prediction.long_adaptive"] = time_function(
+        lambda: model.predict_structure_adaptive(long_sequence, generation_config_kwargs={ "temperature": 0.0 }),
+        repeats=repeats,
+    )
+
+def benchmark_sequence_screening(results: Dict[str, Any], model: ESM3Model, sequences: List[str], num_steps: int, repeats: int):
+    # A small, randomly initialized ESM2 as the fast tier, with the ESM3 stand-in behind it.
+    # Both are 2-layer random models, so these numbers time the code paths only and
+    # say nothing about the relative speed of the real ESM2 and ESM3 checkpoints
+    router = TieredProteinLanguageModel(fast_model=random_esm2_model(), full_model=model)
+    masked_sequences = [sequence[:10] + "_" * 5 + sequence[15:] for sequence in sequences]
+    mutation_codes = [f"{residue}{position + 1}A" for position, residue in enumerate(sequences[0][:16]) if residue != "A"]
+
+    screening_results = {}
+    screening_results["screening.stub.masked_sequence_completion.esm3_stand_in"] = time_function(
+        lambda: model.batch_call(
+            ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION,
+            masked_sequences,
+            generation_config_kwargs={ "num_steps": num_steps },
+        ),
+        repeats=repeats,
+        items=len(masked_sequences),
+    )
+    screening_results["screening.stub.masked_sequence_completion.esm2_random"] = time_function(
+        lambda: router.batch_call(
+            ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION,
+            masked_sequences,
+        ),
+        repeats=repeats,
+        items=len(masked_sequences),
+    )
+    for scoring_strategy in ["wt-marginals", "masked-marginals"]:
+        screening_results[f"screening.stub.mutation_scoring.esm2_random.{scoring_strategy}"] = time_function(
+            lambda: router(
+                ProteinPredictionTask.MUTATION_SCORING,
+                sequences[0],
+                mutation_codes=mutation_codes,
+                scoring_strategy=scoring_strategy,
+            ),
+            repeats=repeats,
+            items=len(mutation_codes),
+        )
+
+    for name, result in screening_results.items():
+        result["note"] = "Random 2-layer stand-ins only; not a comparison of the ESM2 and ESM3 checkpoints."
+        results[name] = result
+
+def benchmark_pipeline(results: Dict[str, Any], model: ESM3Model, sequences: List[str], num_steps: int, repeats: int):
+    reference_pdb = read_fixture("helix_reference.pdb")
+    method = ProteinComparatorMethod.US_ALIGN if executable_exists(ProteinComparatorMethod.US_ALIGN) else ProteinComparatorMethod.RMSD
+    comparator = ProteinComparator(method=method)
+
+    def run_pipeline():
+        for sequence in sequences:
+            resultant_protein = model(
+                ProteinPredictionTask.STRUCTURE_PREDICTION,
+                protein=sequence,
+                generation_config_kwargs={ "num_steps": num_steps, "temperature": 0.0 },
+                return_type=ProteinPredictionReturnType.DEFAULT,
+            )
+            comparator.compute_score_and_alignment(resultant_protein.to_pdb_string(), reference_pdb)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["pipeline.end_to_end"] = time_function(run_pipeline, repeats=repeats, items=len(sequences))
+    results["pipeline.end_to_end"]["comparator"] = method.value
+
+def run_benchmarks(n_samples: int = 32, repeats: int = 5, batch_sizes: List[int] = [1, 4, 16], num_steps: int = 1) -> Dict[str, Any]:
+    torch.set_num_threads(1)
+    results = {}
+
+    model = ESM3Model(model_id="random-stub", model=RandomESM3InferenceClient())
+    wild_type_sequence = ESMProtein.from_pdb(os.path.join(FIXTURES_DIR, "helix_reference.pdb")).sequence
+    sequences = mutant_sequences(wild_type_sequence, n_samples)
+
+    benchmark_dataset(results, n_samples, repeats)
+    benchmark_pdb_parsing(results, repeats)
+    benchmark_comparators(results, n_samples, repeats)
+    benchmark_model(results, model, sequences, batch_sizes, num_steps, repeats)
+    benchmark_sequence_screening(results, model, sequences, num_steps, repeats)
+    benchmark_pipeline(results, model, sequences, num_steps, max(1, repeats // 2))
+
+    return {
+        "metadata": collect_metadata(n_samples=n_samples, repeats=repeats, batch_sizes=batch_sizes, num_steps=num_steps),
+        "results": results,
+    }
+
+def collect_metadata(**settings) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=PROJECT_ROOT).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "settings": settings,
+    }
+
+# Fields of a single result that must match for its durations to be comparable
+COMPARABLE_RESULT_FIELDS = ["items", "comparator"]
+
+def compare_results(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float = 0.1) -> Dict[str, Any]:
+    """Compare the mean durations of two benchmark result files. Benchmarks run with
+    different settings, or (like the end-to-end pipeline, which falls back to RMSD
+    without a USalign executable) with a different comparator, are skipped rather
+    than counted as regressions.
+
+    Args:
+        baseline (Dict[str, Any]): Results of the reference commit.
+        candidate (Dict[str, Any]): Results of the commit under test.
+        threshold (float, optional): Relative slowdown counted as a regression. Defaults to 0.1.
+
+    Returns:
+        Dict[str, Any]: The per-benchmark ratio of candidate to baseline mean duration,
+            the names of the benchmarks that regressed, and the reason every other
+            benchmark was skipped.
+    """
+    ratios = {}
+    skipped = {}
+
+    baseline_settings = baseline["metadata"].get("settings")
+    candidate_settings = candidate["metadata"].get("settings")
+
+    for name, baseline_result in baseline["results"].items():
+        candidate_result = candidate["results"].get(name, {})
+        mismatched_fields = [
+            field for field in COMPARABLE_RESULT_FIELDS
+            if baseline_result.get(field) != candidate_result.get(field)
+        ]
+
+        if "mean_s" not in baseline_result or "mean_s" not in candidate_result:
+            skipped[name] = "not timed in both runs"
+        elif baseline_settings != candidate_settings:
+            skipped[name] = f"settings differ: {baseline_settings} vs. {candidate_settings}"
+        elif len(mismatched_fields) > 0:
+            skipped[name] = "differs in " + ", ".join(
+                f"{field} ({baseline_result.get(field)} vs. {candidate_result.get(field)})" for field in mismatched_fields
+            )
+        else:
+            ratios[name] = candidate_result["mean_s"] / baseline_result["mean_s"]
+
+    return {
+        "baseline_commit": baseline["metadata"]["commit"],
+        "candidate_commit": candidate["metadata"]["commit"],
+        "ratios": ratios,
+        "regressions": sorted(name for name, ratio in ratios.items() if ratio > 1.0 + threshold),
+        "skipped": skipped,
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the data, model and comparator hot paths.")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--samples", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--num-steps", type=int, default=1)
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="Compare two JSON result files instead of running.")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.compare is not None:
+        with open(args.compare[0], "r") as baseline_file, open(args.compare[1], "r") as candidate_file:
+            comparison = compare_results(json.load(baseline_file), json.load(candidate_file), args.threshold)
+        print(json.dumps(comparison, indent=2))
+        return 1 if len(comparison["regressions"]) > 0 else 0
+
+    benchmark_results = run_benchmarks(args.samples, args.repeats, args.batch_sizes, args.num_steps)
+    with open(args.output, "w") as output_file:
+        json.dump(benchmark_results, output_file, indent=2)
+    print(json.dumps(benchmark_results["results"], indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from data import CASPTestSet
+from interfaces import ProteinPredictionReturnType, ProteinPredictionTask
+from models import ESM3Model
+from utils import ProteinComparator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare adaptive-compute and fixed-budget ESM3 structure prediction on CASP.")
+    parser.add_argument("--residues-per-step", type=int, default=32)
+    parser.add_argument("--min-steps", type=int, default=1)
+    parser.add_argument("--max-steps", type=int, default=8)
+    parser.add_argument("--plddt-tolerance", type=float, default=0.005)
+    parser.add_argument("--rmsd-tolerance", type=float, default=0.5)
+    parser.add_argument("--num-samples", type=int, default=1)
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--output", default="casp_adaptive_structure_prediction_results.csv")
+    args = parser.parse_args()
+
+    # Instantiate components
+    model = ESM3Model()
+    comparator = ProteinComparator()
+    test_set = CASPTestSet()
+
+    data = {
+        field_name: [] for field_name in [
+            "subset",
+            "target_id",
+            "pdb_id",
+            "length",
+            "num_steps_budget",
+            "steps_used",
+            "final_num_steps",
+            "stopped_early",
+            "forward_passes_fixed",
+            "forward_passes_adaptive",
+            "adaptive_cost_exceeds_fixed",
+            "US-Align_fixed",
+            "US-Align_adaptive",
+            "avg_pLDDT_fixed",
+            "avg_pLDDT_adaptive",
+            "seconds_fixed",
+            "seconds_adaptive",
+        ]
+    }
+
+    print(f"Running through {len(test_set)} samples...")
+
+    for idx, sample in enumerate(test_set):
+        try:
+            original_protein_fasta = sample["real_fasta"].iloc[0][:-4]
+            real_protein_pdb = sample["real_pdb"].iloc[0]
+
+            # Run inference with the adaptive budget
+            start = time.perf_counter()
+            adaptive_result = model.predict_structure_adaptive(
+                original_protein_fasta,
+                residues_per_step=args.residues_per_step,
+                min_steps=args.min_steps,
+                max_steps=args.max_steps,
+                plddt_tolerance=args.plddt_tolerance,
+                rmsd_tolerance=args.rmsd_tolerance,
+                num_samples=args.num_samples,
+                generation_config_kwargs={ "temperature": args.temperature },
+            )
+            seconds_adaptive = time.perf_counter() - start
+
+            # Run inference with the full budget for the same length
+            start = time.perf_counter()
+            fixed_protein = model(
+                ProteinPredictionTask.STRUCTURE_PREDICTION,
+                protein=original_protein_fasta,
+                generation_config_kwargs={ "num_steps": adaptive_result.num_steps_budget, "temperature": args.temperature },
+                return_type=ProteinPredictionReturnType.DEFAULT,
+            )
+            seconds_fixed = time.perf_counter() - start
+
+            # Compute the US-Align scores of both against the ground truth
+            us_alignment_fixed = comparator.compute_score_and_alignment(fixed_protein.to_pdb_string(), real_protein_pdb)[0]
+            us_alignment_adaptive = comparator.compute_score_and_alignment(adaptive_result.protein.to_pdb_string(), real_protein_pdb)[0]
+
+            for field in ["subset", "target_id", "pdb_id"]:
+                data[field].append(sample[field].iloc[0])
+            data["length"].append(len(original_protein_fasta))
+            data["num_steps_budget"].append(adaptive_result.num_steps_budget)
+            data["steps_used"].append(adaptive_result.steps_used)
+            data["final_num_steps"].append(adaptive_result.final_num_steps)
+            data["stopped_early"].append(adaptive_result.stopped_early)
+            # The fixed run generates a single sample with the full budget
+            data["forward_passes_fixed"].append(adaptive_result.num_steps_budget)
+            data["forward_passes_adaptive"].append(adaptive_result.forward_passes)
+            data["adaptive_cost_exceeds_fixed"].append(adaptive_result.forward_passes > adaptive_result.num_steps_budget)
+            data["US-Align_fixed"].append(float(us_alignment_fixed.final_score))
+            data["US-Align_adaptive"].append(float(us_alignment_adaptive.final_score))
+            data["avg_pLDDT_fixed"].append(np.average(fixed_protein.plddt))
+            data["avg_pLDDT_adaptive"].append(np.average(adaptive_result.protein.plddt))
+            data["seconds_fixed"].append(seconds_fixed)
+            data["seconds_adaptive"].append(seconds_adaptive)
+
+            print(f"{data['target_id'][-1]}: {adaptive_result.steps_used} steps used of a budget of {adaptive_result.num_steps_budget} ({adaptive_result.forward_passes} forward passes)")
+        except Exception as e:
+            # Skip the sample due to the exception
+            print(f"Skipping sample at index {idx} due to `{e}`.")
+
+    results = pd.DataFrame(data)
+    results.to_csv(args.output, index=False)
+
+    print(f"Mean steps used: {results['steps_used'].mean():.2f} of {results['num_steps_budget'].mean():.2f}")
+    print(f"Mean forward passes: {results['forward_passes_adaptive'].mean():.2f} (adaptive) vs. {results['forward_passes_fixed'].mean():.2f} (fixed)")
+    print(f"Targets where adaptive cost more than fixed: {int(results['adaptive_cost_exceeds_fixed'].sum())}")
+    print(f"Mean US-Align (fixed): {results['US-Align_fixed'].mean():.4f}")
+    print(f"Mean US-Align (adaptive): {results['US-Align_adaptive'].mean():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import time
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+import torch
+from esm.sdk.api import ESMProtein
+from data import CASPTestSet
+from interfaces import ProteinPredictionReturnType, ProteinPredictionTask
+from models import ESM3Model
+from utils import ProteinComparator
+
+
+def timed_prediction(
+    model: ESM3Model,
+    sequence: str,
+    windowing_kwargs: Optional[Dict[str, Any]] = None,
+) -> Tuple[ESMProtein, float, Optional[float]]:
+    # Reset the peak memory statistics so that they cover only this prediction
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+
+    start = time.perf_counter()
+    resultant_protein = model(
+        ProteinPredictionTask.STRUCTURE_PREDICTION,
+        protein=sequence,
+        generation_config_kwargs={ "num_steps": 1, "temperature": 0.0 },
+        return_type=ProteinPredictionReturnType.DEFAULT,
+        windowing_kwargs=windowing_kwargs,
+    )
+    seconds = time.perf_counter() - start
+
+    peak_memory_mb = torch.cuda.max_memory_allocated() / 2**20 if torch.cuda.is_available() else None
+    return resultant_protein, seconds, peak_memory_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare windowed and full-length ESM3 structure prediction on CASP.")
+    parser.add_argument("--window-size", type=int, default=256)
+    parser.add_argument("--window-overlap", type=int, default=64)
+    parser.add_argument("--window-batch-size", type=int, default=4)
+    parser.add_argument("--min-length", type=int, default=0, help="Only evaluate targets at least this long (targets that fit in one window are always skipped).")
+    parser.add_argument("--output", default="casp_windowed_structure_prediction_results.csv")
+    args = parser.parse_args()
+
+    # Instantiate components
+    model = ESM3Model()
+    comparator = ProteinComparator()
+    test_set = CASPTestSet()
+
+    windowing_kwargs = {
+        "window_size": args.window_size,
+        "window_overlap": args.window_overlap,
+        "window_batch_size": args.window_batch_size,
+    }
+
+    data = {
+        field_name: [] for field_name in [
+            "subset",
+            "target_id",
+            "pdb_id",
+            "length",
+            "US-Align",
+            "US-Align_windowed",
+            "US-Align_loss",
+            "avg_pLDDT",
+            "avg_pLDDT_windowed",
+            "seconds",
+            "seconds_windowed",
+            "peak_memory_mb",
+            "peak_memory_mb_windowed",
+        ]
+    }
+
+    print(f"Running through {len(test_set)} samples...")
+    skipped_single_window = 0
+
+    for idx, sample in enumerate(test_set):
+        try:
+            original_protein_fasta = sample["real_fasta"].iloc[0][:-4]
+            real_protein_pdb = sample["real_pdb"].iloc[0]
+
+            if len(original_protein_fasta) < args.min_length:
+                continue
+
+            # Windowing leaves targets that fit in one window unchanged, and
+            # their trivial zero loss would understate the mean loss
+            if len(original_protein_fasta) <= args.window_size:
+                skipped_single_window += 1
+                continue
+
+            # Run inference on the full-length and the windowed sequence
+            full_protein, seconds, peak_memory_mb = timed_prediction(model, original_protein_fasta)
+            windowed_protein, seconds_windowed, peak_memory_mb_windowed = timed_prediction(model, original_protein_fasta, windowing_kwargs)
+
+            # Compute the US-Align scores of both against the ground truth
+            us_alignment = comparator.compute_score_and_alignment(full_protein.to_pdb_string(), real_protein_pdb)[0]
+            us_alignment_windowed = comparator.compute_score_and_alignment(windowed_protein.to_pdb_string(), real_protein_pdb)[0]
+
+            for field in ["subset", "target_id", "pdb_id"]:
+                data[field].append(sample[field].iloc[0])
+            data["length"].append(len(original_protein_fasta))
+            data["US-Align"].append(float(us_alignment.final_score))
+            data["US-Align_windowed"].append(float(us_alignment_windowed.final_score))
+            data["US-Align_loss"].append(float(us_alignment.final_score) - float(us_alignment_windowed.final_score))
+            data["avg_pLDDT"].append(np.average(full_protein.plddt))
+            data["avg_pLDDT_windowed"].append(np.average(windowed_protein.plddt))
+            data["seconds"].append(seconds)
+            data["seconds_windowed"].append(seconds_windowed)
+            data["peak_memory_mb"].append(peak_memory_mb)
+            data["peak_memory_mb_windowed"].append(peak_memory_mb_windowed)
+
+            print(f"{data['target_id'][-1]}: US-Align {data['US-Align'][-1]:.4f} -> {data['US-Align_windowed'][-1]:.4f} (windowed)")
+        except Exception as e:
+            # Skip the sample due to the exception
+            print(f"Skipping sample at index {idx} due to `{e}`.")
+
+    results = pd.DataFrame(data)
+    results.to_csv(args.output, index=False)
+
+    print(f"Evaluated {len(results.index)} of {len(test_set)} targets ({skipped_single_window} skipped as fitting in a single window).")
+    print(f"Mean US-Align loss: {results['US-Align_loss'].mean():.4f}")
+    print(f"Max US-Align loss: {results['US-Align_loss'].max():.4f}")
+
+
+if __name__ == "__main__":
+    main()
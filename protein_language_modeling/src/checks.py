@@ -0,0 +1,137 @@
+import argparse
+import sys
+from typing import List, Optional
+from esm.sdk.api import ESMProtein
+from interfaces import ProteinPredictionReturnType, ProteinPredictionTask
+from models import ESM2Model, ESM3Model, TieredProteinLanguageModel
+from stand_ins import RandomESM3InferenceClient, random_esm2_model
+from utils import best_usalign_rows_by_structure, parse_usalign_tabular_output
+
+SEQUENCE = "DQATSLRILNNGHAFNVEFDDSQDKAVLKGGPLDGTYRLIQFHFHWGSLDGQGSEHTVDKK"
+
+# The layout of `USalign -ter 1 -outfmt 2 -dir1 structures/ chain_list reference.pdb`
+# for three predicted structures against a two-chain reference, where `1.pdb` could
+# not be read. Rows follow the chain list order, not the structure indices.
+USALIGN_BATCH_OUTPUT = "\n".join([
+    "#PDBchain1\tPDBchain2\tTM1\tTM2\tRMSD\tID1\tID2\tIDali\tL1\tL2\tLali",
+    "/tmp/scratch/structures/2.pdb:A\t/tmp/scratch/reference.pdb:A\t0.8123\t0.7012\t1.85\t0.967\t0.836\t0.983\t61\t70\t60",
+    "/tmp/scratch/structures/2.pdb:A\t/tmp/scratch/reference.pdb:B\t0.4321\t0.3805\t3.10\t0.410\t0.357\t0.450\t61\t70\t55",
+    "Warning! Cannot parse file: /tmp/scratch/structures/1.pdb. Chain number 0.",
+    "/tmp/scratch/structures/0.pdb:A\t/tmp/scratch/reference.pdb:A\t0.5510\t0.4990\t2.47\t0.902\t0.786\t0.948\t61\t70\t58",
+    "/tmp/scratch/structures/0.pdb:A\t/tmp/scratch/reference.pdb:B\t0.6020\t0.5130\t2.12\t0.885\t0.771\t0.931\t61\t70\t59",
+    "#Total CPU time is  0.05 seconds",
+    "",
+])
+
+
+def check_usalign_batch_parsing():
+    """Parse a `-dir1 ... -outfmt 2` batch, and map its rows back to the predicted structures."""
+    rows = parse_usalign_tabular_output(USALIGN_BATCH_OUTPUT)
+
+    # The header, the warning and the CPU time are not alignments
+    assert len(rows) == 4, f"Expected 4 alignments, got {len(rows)}."
+    for row in rows:
+        assert isinstance(row["PDBchain1"], str) and isinstance(row["PDBchain2"], str)
+        assert all(isinstance(row[column], float) for column in ["TM1", "TM2", "RMSD", "ID1", "ID2", "IDali"])
+        assert all(isinstance(row[column], int) for column in ["L1", "L2", "Lali"])
+
+    # Every structure keeps its best reference chain, in the order of the pairs
+    best_rows = best_usalign_rows_by_structure(rows, 3)
+    assert best_rows[0]["TM1"] == 0.6020 and best_rows[0]["PDBchain2"].endswith(":B")
+    assert best_rows[1] is None
+    assert best_rows[2]["TM1"] == 0.8123 and best_rows[2]["PDBchain2"].endswith(":A")
+
+
+def check_router_routing():
+    """Route every task through small random models, and check which tier handles it."""
+    full_models = []
+
+    def full_model_factory() -> ESM3Model:
+        full_models.append(ESM3Model(model_id="random-stub", model=RandomESM3InferenceClient()))
+        return full_models[-1]
+
+    router = TieredProteinLanguageModel(fast_model=random_esm2_model(), full_model_factory=full_model_factory)
+
+    # Sequence tasks stay on the fast model, without building the full model
+    for task in [ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION, ProteinPredictionTask.MUTATION_SCORING]:
+        assert router.route(task) is router.fast_model, f"{task.name} was not sent to the fast model."
+    completed_sequence = router(ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION, SEQUENCE[:10] + "_____" + SEQUENCE[15:])
+    assert len(completed_sequence) == len(SEQUENCE) and "_" not in completed_sequence
+    scores = router(ProteinPredictionTask.MUTATION_SCORING, SEQUENCE, mutation_codes=["D1A", "Q2A"])
+    assert len(scores) == 2
+
+    # The router is a drop-in for ESM3Model: its call pattern and return types work on either tier
+    completed_protein = router(
+        ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION,
+        SEQUENCE[:10] + "_____" + SEQUENCE[15:],
+        ProteinPredictionReturnType.DEFAULT,
+        generation_config_kwargs={ "num_steps": 1, "temperature": 0.0 },
+    )
+    assert isinstance(completed_protein, ESMProtein) and len(completed_protein.sequence) == len(SEQUENCE)
+    completed_sequences = router.batch_call(
+        ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION,
+        [SEQUENCE[:10] + "_____" + SEQUENCE[15:], "_____" + SEQUENCE[5:]],
+        generation_config_kwargs={ "num_steps": 1 },
+    )
+    assert all(isinstance(sequence, str) and "_" not in sequence for sequence in completed_sequences)
+    assert len(full_models) == 0, "The full model was built for a sequence task."
+
+    # Structure tasks escalate to the full model, which is built once
+    for task in [ProteinPredictionTask.STRUCTURE_PREDICTION, ProteinPredictionTask.INVERSE_FOLDING]:
+        assert router.route(task) is full_models[0], f"{task.name} was not escalated to the full model."
+    predicted_protein = router(
+        ProteinPredictionTask.STRUCTURE_PREDICTION,
+        SEQUENCE,
+        ProteinPredictionReturnType.DEFAULT,
+        generation_config_kwargs={ "num_steps": 1 },
+    )
+    assert predicted_protein.coordinates.shape[0] == len(SEQUENCE)
+    assert len(full_models) == 1, "The full model was built more than once."
+
+    # Tasks the fast model does not support fall through to the full model, even when not escalated
+    fall_through_router = TieredProteinLanguageModel(
+        fast_model=router.fast_model,
+        full_model_factory=full_model_factory,
+        escalated_tasks=set(),
+    )
+    assert fall_through_router.route(ProteinPredictionTask.INVERSE_FOLDING) is full_models[-1]
+    assert fall_through_router.route(ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION) is router.fast_model
+
+
+def check_esm2_checkpoint(model_id: str = "8M"):
+    """Download and load a real ESM2 checkpoint, and check that it recognizes a masked residue."""
+    model = ESM2Model(model_id=model_id, device="cpu")
+
+    # A trained checkpoint should prefer the wild-type amino acid over a proline in a helix
+    assert model.score_mutations(SEQUENCE, ["L6P"])[0] < 0.0
+    completed_sequence = model(ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION, SEQUENCE[:5] + "_" + SEQUENCE[6:])
+    assert len(completed_sequence) == len(SEQUENCE) and "_" not in completed_sequence
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Check USalign batch parsing, model routing and ESM2 checkpoint loading.")
+    parser.add_argument("--offline", action="store_true", help="Skip the checks that download checkpoints.")
+    parser.add_argument("--esm2-model-id", default="8M")
+    args = parser.parse_args(argv)
+
+    checks = [
+        ("USalign batch parsing", check_usalign_batch_parsing),
+        ("router routing", check_router_routing),
+    ]
+    if not args.offline:
+        checks.append((f"ESM2 {args.esm2_model_id} checkpoint", lambda: check_esm2_checkpoint(args.esm2_model_id)))
+
+    failures = 0
+    for name, check in checks:
+        try:
+            check()
+            print(f"PASS: {name}")
+        except Exception as e:
+            failures += 1
+            print(f"FAIL: {name} due to `{e!r}`")
+
+    return 1 if failures > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
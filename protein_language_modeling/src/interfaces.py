@@ -11,6 +11,8 @@ class ProteinPredictionTask(Enum):
     """Predicting the sequence of a protein based on its three-dimensional atomic structure."""
     UNKNOWN = 3
     """A prediction task determined by external arguments"""
+    MUTATION_SCORING = 4
+    """Scoring the effect of point mutations on a protein sequence by the log-likelihood ratio of the mutant and wild-type amino acids."""
 
 class ProteinPredictionReturnType(Enum):
     STRING = str
@@ -1,8 +1,13 @@
+from dataclasses import dataclass, field
 from io import StringIO
+import math
 import os
-from typing import Any, Dict, Optional, Set, Union
+import re
+from typing import Any, Callable, Dict, List, Literal, Optional, Set, Tuple, Union
 from dotenv import load_dotenv
 from huggingface_hub import login
+from esm.data import Alphabet
+from esm.model.esm2 import ESM2
 from esm.models.esm3 import ESM3
 from esm.sdk.api import ESM3InferenceClient, ESMProtein, GenerationConfig
 import torch
@@ -10,24 +15,172 @@ from interfaces import BaseProteinLanguageModel, ProteinPredictionReturnType, Pr
 
 load_dotenv()
 
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+ESM2_CHECKPOINTS = {
+    "8M": "esm2_t6_8M_UR50D",
+    "35M": "esm2_t12_35M_UR50D",
+    "150M": "esm2_t30_150M_UR50D",
+    "650M": "esm2_t33_650M_UR50D",
+    "3B": "esm2_t36_3B_UR50D",
+    "15B": "esm2_t48_15B_UR50D",
+}
+
+# Layers, embedding dimension and attention heads of every ESM2 checkpoint
+ESM2_ARCHITECTURES = {
+    "esm2_t6_8M_UR50D": (6, 320, 20),
+    "esm2_t12_35M_UR50D": (12, 480, 20),
+    "esm2_t30_150M_UR50D": (30, 640, 20),
+    "esm2_t33_650M_UR50D": (33, 1280, 20),
+    "esm2_t36_3B_UR50D": (36, 2560, 40),
+    "esm2_t48_15B_UR50D": (48, 5120, 40),
+}
+
+ESM2_CHECKPOINT_URL = "https://dl.fbaipublicfiles.com/fair-esm/models/{}.pt"
+
+def load_esm2_checkpoint(model_name: str) -> Tuple[ESM2, Alphabet]:
+    """Load an ESM2 checkpoint without `esm.pretrained`. `fair-esm` and `esm` (ESM3)
+    both install an `esm/pretrained.py`, and only ESM3's can coexist with `ESM3Model`.
+
+    Args:
+        model_name (str): An ESM2 checkpoint name, e.g. "esm2_t6_8M_UR50D".
+
+    Returns:
+        Tuple[ESM2, Alphabet]: The model with the checkpoint weights, and its alphabet.
+    """
+    num_layers, embed_dim, attention_heads = ESM2_ARCHITECTURES[model_name]
+    alphabet = Alphabet.from_architecture("ESM-1b")
+    model = ESM2(
+        num_layers=num_layers,
+        embed_dim=embed_dim,
+        attention_heads=attention_heads,
+        alphabet=alphabet,
+        token_dropout=True,
+    )
+
+    # The official checkpoints pickle their training configuration
+    # next to the weights, so they cannot be loaded weights-only
+    checkpoint = torch.hub.load_state_dict_from_url(
+        ESM2_CHECKPOINT_URL.format(model_name),
+        map_location="cpu",
+        weights_only=False,
+    )
+    state_dict = {
+        re.sub(r"^(encoder\.sentence_encoder\.|encoder\.)", "", name): parameter
+        for name, parameter in checkpoint["model"].items()
+    }
+
+    # The contact regression weights are distributed separately and not needed here
+    missing_keys, unexpected_keys = model.load_state_dict(state_dict, strict=False)
+    missing_keys = [key for key in missing_keys if not key.startswith("contact_head.regression.")]
+    if len(missing_keys) > 0 or len(unexpected_keys) > 0:
+        raise RuntimeError(f"The {model_name} checkpoint does not match ESM2: missing {missing_keys}, unexpected {unexpected_keys}.")
+
+    return model, alphabet
+
+def _window_spans(length: int, window_size: int, window_overlap: int) -> List[Tuple[int, int]]:
+    # Use the fewest windows that cover the sequence with overlaps of at least
+    # `window_overlap`, shrink them to a common width that still does, and space
+    # their starts evenly, so that no window overlaps its neighbour needlessly
+    if length <= window_size:
+        return [(0, length)]
+    num_windows = math.ceil((length - window_overlap) / (window_size - window_overlap))
+    width = math.ceil((length + (num_windows - 1) * window_overlap) / num_windows)
+    starts = [idx * (length - width) // (num_windows - 1) for idx in range(num_windows)]
+    return [(start, start + width) for start in starts]
+
+def _kabsch_superpose(mobile: torch.Tensor, target: torch.Tensor, coordinates: torch.Tensor) -> torch.Tensor:
+    # Find the rotation and translation minimizing the RMSD of
+    # `mobile` onto `target`, and apply it to `coordinates`
+    mobile_center, target_center = mobile.mean(dim=0), target.mean(dim=0)
+    covariance = (mobile - mobile_center).T @ (target - target_center)
+    U, _S, Vt = torch.linalg.svd(covariance)
+    reflection = torch.sign(torch.det(Vt.T @ U.T))
+    correction = torch.diag(torch.tensor([1.0, 1.0, reflection.item()], dtype=covariance.dtype))
+    rotation = Vt.T @ correction @ U.T
+    return (coordinates - mobile_center) @ rotation.T + target_center
+
+def _stitch_windows(sequence: str, spans: List[Tuple[int, int]], windows: List[ESMProtein]) -> ESMProtein:
+    coordinates = windows[0].coordinates.float()
+    plddt = windows[0].plddt.float() if windows[0].plddt is not None else None
+    end = spans[0][1]
+
+    for (start, window_end), window in zip(spans[1:], windows[1:]):
+        overlap = end - start
+        window_coordinates = window.coordinates.float()
+
+        # Superpose the window onto the chain using the alpha carbons of the overlap
+        target, mobile = coordinates[start:end, 1], window_coordinates[:overlap, 1]
+        resolved = torch.isfinite(target).all(dim=-1) & torch.isfinite(mobile).all(dim=-1)
+        window_coordinates = _kabsch_superpose(mobile[resolved], target[resolved], window_coordinates)
+
+        # Switch from the chain to the window halfway through the overlap
+        cut = overlap // 2
+        coordinates = torch.cat([coordinates[:start + cut], window_coordinates[cut:]], dim=0)
+
+        # Blend the per-residue confidences linearly across the overlap
+        if plddt is not None and window.plddt is not None:
+            window_plddt = window.plddt.float()
+            weights = torch.arange(1, overlap + 1, dtype=torch.float32) / (overlap + 1)
+            blended = (1.0 - weights) * plddt[start:end] + weights * window_plddt[:overlap]
+            plddt = torch.cat([plddt[:start], blended, window_plddt[overlap:]], dim=0)
+        else:
+            plddt = None
+
+        end = window_end
+
+    return ESMProtein(sequence=sequence, coordinates=coordinates, plddt=plddt)
+
+def _adaptive_step_schedule(length: int, residues_per_step: int, min_steps: int, max_steps: int) -> Tuple[int, List[int]]:
+    # The step budget grows with the sequence length. Every stage regenerates from
+    # scratch, so cheap probes doubling from `min_steps` may spend at most half the
+    # budget before the last stage decodes with the full budget. Convergence needs
+    # two probes to compare, so without room for them only the budget is run
+    budget = min(max_steps, max(min_steps, math.ceil(length / residues_per_step)))
+    probes = []
+    num_steps = min_steps
+    while num_steps < budget and sum(probes) + num_steps <= budget // 2:
+        probes.append(num_steps)
+        num_steps *= 2
+    if len(probes) < 2:
+        return budget, [budget]
+    return budget, probes + [budget]
+
+def _alpha_carbon_rmsd(protein1: ESMProtein, protein2: ESMProtein) -> float:
+    alpha_carbons1, alpha_carbons2 = protein1.coordinates[:, 1].float(), protein2.coordinates[:, 1].float()
+    resolved = torch.isfinite(alpha_carbons1).all(dim=-1) & torch.isfinite(alpha_carbons2).all(dim=-1)
+    superposed = _kabsch_superpose(alpha_carbons1[resolved], alpha_carbons2[resolved], alpha_carbons1[resolved])
+    return torch.sqrt(((superposed - alpha_carbons2[resolved]) ** 2).sum(dim=-1).mean()).item()
+
+@dataclass
+class AdaptiveGenerationResult:
+    protein: ESMProtein
+    num_steps_budget: int
+    steps_used: int
+    """Decoding steps summed over every stage run, at most 1.5 times `num_steps_budget`."""
+    forward_passes: int
+    """`steps_used` times the ensemble size, to compare with `num_steps_budget` for a single sample."""
+    final_num_steps: int
+    """Decoding steps of the stage that produced `protein`."""
+    stopped_early: bool
+    stages: List[Dict[str, Any]] = field(default_factory=list)
+
 class ESM3Model(BaseProteinLanguageModel):
     def __init__(
         self,
         model_id: str = "esm3-open",
-        device: str = "cuda" if torch.cuda.is_available() else "cpu"
+        device: str = "cuda" if torch.cuda.is_available() else "cpu",
+        model: Optional[ESM3InferenceClient] = None,
     ):
-        login(token=os.getenv("HF_TOKEN"))
         self.model_id = model_id
-        self.model: ESM3InferenceClient = ESM3.from_pretrained(model_id).to(device)
-        
-    def __call__(
-        self,
-        task: ProteinPredictionTask,
-        protein: Union[str, Any],
-        return_type: ProteinPredictionReturnType = ProteinPredictionReturnType.STRING,
-        # Model-specific kwargs
-        generation_config_kwargs: Optional[Dict[str, Any]] = { "num_steps": 8 },
-    ) -> Union[str, Any]:
+        if model is None:
+            login(token=os.getenv("HF_TOKEN"))
+            self.model: ESM3InferenceClient = ESM3.from_pretrained(model_id).to(device)
+        else:
+            # Use the given inference client (e.g. a stub or randomly initialized model)
+            self.model: ESM3InferenceClient = model
+
+    def _prepare_protein(self, task: ProteinPredictionTask, protein: Union[str, Any]) -> ESMProtein:
         if isinstance(protein, str):
             if task == ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION or \
                 task == ProteinPredictionTask.STRUCTURE_PREDICTION:
@@ -37,26 +190,210 @@ class ESM3Model(BaseProteinLanguageModel):
                 protein = ESMProtein.from_pdb(temporary_file)
             elif task == ProteinPredictionTask.UNKNOWN:
                 raise NotImplementedError()
-        
-        if task == ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION:
-            generation_config = GenerationConfig("sequence", temperature=0.7, **generation_config_kwargs)
-            output: ESMProtein = self.model.generate(protein, generation_config)
-            if return_type == ProteinPredictionReturnType.STRING:
-                output: str = output.sequence
-        elif task == ProteinPredictionTask.STRUCTURE_PREDICTION:
+
+        if task == ProteinPredictionTask.STRUCTURE_PREDICTION:
             protein.coordinates = None
-            generation_config = GenerationConfig("structure", **generation_config_kwargs)
-            output: ESMProtein = self.model.generate(protein, generation_config)
-            if return_type == ProteinPredictionReturnType.STRING:
-                output: str = output.to_pdb_string()
         elif task == ProteinPredictionTask.INVERSE_FOLDING:
             protein.sequence = None
-            generation_config = GenerationConfig("sequence", **generation_config_kwargs)
-            output: ESMProtein = self.model.generate(protein, generation_config)
-            if return_type == ProteinPredictionReturnType.STRING:
-                output: str = output.sequence
 
+        return protein
+
+    def _generation_config(self, task: ProteinPredictionTask, generation_config_kwargs: Dict[str, Any]) -> GenerationConfig:
+        if task == ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION:
+            return GenerationConfig("sequence", temperature=0.7, **generation_config_kwargs)
+        elif task == ProteinPredictionTask.STRUCTURE_PREDICTION:
+            return GenerationConfig("structure", **generation_config_kwargs)
+        elif task == ProteinPredictionTask.INVERSE_FOLDING:
+            return GenerationConfig("sequence", **generation_config_kwargs)
+        else:
+            raise NotImplementedError()
+
+    def _format_output(self, task: ProteinPredictionTask, output: ESMProtein, return_type: ProteinPredictionReturnType) -> Union[str, Any]:
+        if return_type == ProteinPredictionReturnType.STRING:
+            if task == ProteinPredictionTask.STRUCTURE_PREDICTION:
+                return output.to_pdb_string()
+            else:
+                return output.sequence
         return output
+
+    def __call__(
+        self,
+        task: ProteinPredictionTask,
+        protein: Union[str, Any],
+        return_type: ProteinPredictionReturnType = ProteinPredictionReturnType.STRING,
+        # Model-specific kwargs
+        generation_config_kwargs: Optional[Dict[str, Any]] = { "num_steps": 8 },
+        windowing_kwargs: Optional[Dict[str, Any]] = None,
+        adaptive_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> Union[str, Any]:
+        if windowing_kwargs is not None and adaptive_kwargs is not None:
+            raise ValueError("Windowed and adaptive structure prediction cannot be combined.")
+
+        if task == ProteinPredictionTask.STRUCTURE_PREDICTION and adaptive_kwargs is not None:
+            sequence = protein if isinstance(protein, str) else protein.sequence
+            result = self.predict_structure_adaptive(sequence, generation_config_kwargs=generation_config_kwargs, **adaptive_kwargs)
+            return self._format_output(task, result.protein, return_type)
+
+        if task == ProteinPredictionTask.STRUCTURE_PREDICTION and windowing_kwargs is not None:
+            sequence = protein if isinstance(protein, str) else protein.sequence
+            output = self.predict_structure_windowed(sequence, generation_config_kwargs=generation_config_kwargs, **windowing_kwargs)
+            return self._format_output(task, output, return_type)
+
+        protein = self._prepare_protein(task, protein)
+        generation_config = self._generation_config(task, generation_config_kwargs)
+        output: ESMProtein = self.model.generate(protein, generation_config)
+        return self._format_output(task, output, return_type)
+
+    def batch_call(
+        self,
+        task: ProteinPredictionTask,
+        proteins: List[Union[str, Any]],
+        return_type: ProteinPredictionReturnType = ProteinPredictionReturnType.STRING,
+        # Model-specific kwargs
+        generation_config_kwargs: Optional[Dict[str, Any]] = { "num_steps": 8 },
+    ) -> List[Union[str, Any]]:
+        """Run the same task on several proteins with a single batched generation call.
+
+        Args:
+            task (ProteinPredictionTask): The task to run on every protein.
+            proteins (List[Union[str, Any]]): Sequences, PDB strings or `ESMProtein`s.
+            return_type (ProteinPredictionReturnType, optional): Defaults to ProteinPredictionReturnType.STRING.
+            generation_config_kwargs (Optional[Dict[str, Any]], optional): Defaults to { "num_steps": 8 }.
+
+        Returns:
+            List[Union[str, Any]]: The outputs in the order of `proteins`.
+        """
+        proteins = [self._prepare_protein(task, protein) for protein in proteins]
+        generation_configs = [self._generation_config(task, generation_config_kwargs) for _ in proteins]
+        outputs: List[ESMProtein] = self.model.batch_generate(proteins, generation_configs)
+        return [self._format_output(task, output, return_type) for output in outputs]
+
+    def predict_structure_windowed(
+        self,
+        sequence: str,
+        window_size: int = 256,
+        window_overlap: int = 64,
+        window_batch_size: int = 4,
+        generation_config_kwargs: Optional[Dict[str, Any]] = { "num_steps": 8 },
+    ) -> ESMProtein:
+        """Predict the structure of a long sequence from overlapping windows.
+        Each window is predicted independently (`window_batch_size` at a time),
+        then superposed onto the chain built so far using the alpha carbons of
+        the overlap. The per-residue pLDDT is blended linearly across overlaps.
+
+        Args:
+            sequence (str): The protein sequence.
+            window_size (int, optional): Most residues per window; windows are narrowed evenly when fewer suffice. Defaults to 256.
+            window_overlap (int, optional): Fewest residues shared by consecutive windows. Defaults to 64.
+            window_batch_size (int, optional): Windows per batched generation call. Defaults to 4.
+            generation_config_kwargs (Optional[Dict[str, Any]], optional): Defaults to { "num_steps": 8 }.
+
+        Returns:
+            ESMProtein: The stitched full-length structure.
+        """
+        if not (3 <= window_overlap < window_size):
+            raise ValueError(f"The window overlap must be at least 3 and less than the window size, got {window_overlap}.")
+
+        spans = _window_spans(len(sequence), window_size, window_overlap)
+        windows: List[ESMProtein] = []
+        for batch_start in range(0, len(spans), window_batch_size):
+            windows += self.batch_call(
+                ProteinPredictionTask.STRUCTURE_PREDICTION,
+                [sequence[start:end] for start, end in spans[batch_start:batch_start + window_batch_size]],
+                return_type=ProteinPredictionReturnType.DEFAULT,
+                generation_config_kwargs=generation_config_kwargs,
+            )
+
+        return _stitch_windows(sequence, spans, windows)
+
+    def predict_structure_adaptive(
+        self,
+        sequence: str,
+        residues_per_step: int = 32,
+        min_steps: int = 1,
+        max_steps: int = 8,
+        plddt_tolerance: float = 0.005,
+        rmsd_tolerance: float = 0.5,
+        num_samples: int = 1,
+        generation_config_kwargs: Optional[Dict[str, Any]] = { "temperature": 0.0 },
+    ) -> AdaptiveGenerationResult:
+        """Predict a structure with a decoding budget chosen from the sequence length.
+        Cheap probes of `min_steps`, twice that, ... steps are generated first, stopping
+        early once the mean pLDDT or the structure (alpha carbon RMSD after superposition)
+        stops changing between consecutive probes. Otherwise the last stage decodes with
+        the full budget, e.g. 1, 2 and then 8 steps for a budget of 8. Each stage regenerates
+        from scratch, so the probes are limited to half the budget: a target that converges
+        costs a fraction of the fixed budget, and one that does not costs up to 1.5 times it.
+        Budgets too small for two probes are decoded once, without probing.
+
+        With `num_samples > 1`, every stage generates an ensemble in one batched call and
+        keeps its highest mean pLDDT sample, costing `num_samples` forward passes per step.
+
+        Args:
+            sequence (str): The protein sequence.
+            residues_per_step (int, optional): Residues per decoding step of the budget. Defaults to 32.
+            min_steps (int, optional): Smallest decoding budget, and the steps of the first stage. Defaults to 1.
+            max_steps (int, optional): Largest decoding budget. Defaults to 8.
+            plddt_tolerance (float, optional): Mean pLDDT change counted as converged. Defaults to 0.005.
+            rmsd_tolerance (float, optional): Alpha carbon RMSD (in Angstroms) counted as converged. Defaults to 0.5.
+            num_samples (int, optional): Ensemble size per stage. Defaults to 1.
+            generation_config_kwargs (Optional[Dict[str, Any]], optional): Any `num_steps` is overridden, and
+                `temperature` defaults to 0.0 so that consecutive stages are comparable. Defaults to { "temperature": 0.0 }.
+
+        Returns:
+            AdaptiveGenerationResult: The selected structure and the steps used to obtain it.
+
+        Raises:
+            ValueError: If an ensemble is requested with a zero temperature, which only repeats the same sample.
+        """
+        # Without an explicit temperature, GenerationConfig samples at 1.0,
+        # and the convergence test would compare unrelated samples
+        generation_config_kwargs = {
+            "temperature": 0.0,
+            **{ key: value for key, value in generation_config_kwargs.items() if key != "num_steps" },
+        }
+        if num_samples > 1 and generation_config_kwargs["temperature"] == 0.0:
+            raise ValueError(f"An ensemble of {num_samples} samples needs a non-zero temperature.")
+
+        budget, schedule = _adaptive_step_schedule(len(sequence), residues_per_step, min_steps, max_steps)
+
+        previous_protein: Optional[ESMProtein] = None
+        stages: List[Dict[str, Any]] = []
+        steps_used = 0
+
+        for num_steps in schedule:
+            samples: List[ESMProtein] = self.batch_call(
+                ProteinPredictionTask.STRUCTURE_PREDICTION,
+                [sequence] * num_samples,
+                return_type=ProteinPredictionReturnType.DEFAULT,
+                generation_config_kwargs={ "num_steps": num_steps, **generation_config_kwargs },
+            )
+            steps_used += num_steps
+
+            # Keep the most confident sample of the ensemble
+            protein = max(samples, key=lambda sample: sample.plddt.float().mean().item())
+            mean_plddt = protein.plddt.float().mean().item()
+
+            stage = { "num_steps": num_steps, "mean_plddt": mean_plddt, "plddt_change": None, "rmsd_change": None }
+            if previous_protein is not None:
+                stage["plddt_change"] = abs(mean_plddt - previous_protein.plddt.float().mean().item())
+                stage["rmsd_change"] = _alpha_carbon_rmsd(protein, previous_protein)
+            stages.append(stage)
+            previous_protein = protein
+
+            if stage["plddt_change"] is not None and \
+                (stage["plddt_change"] <= plddt_tolerance or stage["rmsd_change"] <= rmsd_tolerance):
+                break
+
+        return AdaptiveGenerationResult(
+            protein=previous_protein,
+            num_steps_budget=budget,
+            steps_used=steps_used,
+            forward_passes=steps_used * num_samples,
+            final_num_steps=stages[-1]["num_steps"],
+            stopped_early=len(stages) < len(schedule),
+            stages=stages,
+        )
     
     def supported_tasks(self) -> Set[ProteinPredictionTask]:
         return set([
@@ -65,6 +402,211 @@ class ESM3Model(BaseProteinLanguageModel):
             ProteinPredictionTask.INVERSE_FOLDING,
         ])
 
+class ESM2Model(BaseProteinLanguageModel):
+    def __init__(
+        self,
+        model_id: str = "35M",
+        device: str = "cuda" if torch.cuda.is_available() else "cpu",
+        model: Optional[ESM2] = None,
+        alphabet: Optional[Alphabet] = None,
+        batch_size: int = 16,
+    ):
+        # Accept either a checkpoint size (e.g. "35M") or a checkpoint name
+        self.model_id = ESM2_CHECKPOINTS.get(model_id, model_id)
+        if model is None:
+            model, alphabet = load_esm2_checkpoint(self.model_id)
+        elif alphabet is None:
+            # Use the alphabet of the given (e.g. randomly initialized) model
+            alphabet = model.alphabet
+
+        self.device = device
+        self.model: ESM2 = model.eval().to(device)
+        self.alphabet = alphabet
+        self.batch_converter = alphabet.get_batch_converter()
+        self.batch_size = batch_size
+        self.amino_acid_indices = torch.tensor([alphabet.get_idx(amino_acid) for amino_acid in AMINO_ACIDS])
+
+    @torch.no_grad()
+    def _log_probabilities(self, tokens: torch.Tensor) -> torch.Tensor:
+        logits = self.model(tokens.to(self.device), repr_layers=[])["logits"]
+        return torch.log_softmax(logits, dim=-1).cpu()
+
+    def _tokenize(self, sequences: List[str]) -> torch.Tensor:
+        # Masked residues ('_') become the mask token of the alphabet
+        _labels, _strings, tokens = self.batch_converter([
+            (str(idx), sequence.replace("_", "<mask>")) for idx, sequence in enumerate(sequences)
+        ])
+        return tokens
+
+    def _complete_masked_sequences(self, sequences: List[str]) -> List[str]:
+        completed_sequences = []
+        offset = int(self.alphabet.prepend_bos)
+
+        for batch_start in range(0, len(sequences), self.batch_size):
+            batch = sequences[batch_start:batch_start + self.batch_size]
+            log_probabilities = self._log_probabilities(self._tokenize(batch))
+
+            # Fill the masks with the most likely canonical amino acid
+            predicted = log_probabilities[:, :, self.amino_acid_indices].argmax(dim=-1)
+            for idx, sequence in enumerate(batch):
+                completed_sequences.append("".join(
+                    AMINO_ACIDS[predicted[idx, position + offset]] if residue == "_" else residue
+                    for position, residue in enumerate(sequence)
+                ))
+
+        return completed_sequences
+
+    def score_mutations(
+        self,
+        sequence: str,
+        mutation_codes: List[str],
+        scoring_strategy: Literal["wt-marginals", "masked-marginals"] = "wt-marginals",
+    ) -> List[float]:
+        """Score point mutations (e.g. "S68G", 1-indexed) by the log-likelihood ratio
+        of the mutant and wild-type amino acids. `wt-marginals` needs a single forward
+        pass over the wild-type sequence; `masked-marginals` masks every mutated position
+        in turn, in batches of `batch_size`.
+
+        Args:
+            sequence (str): The wild-type protein sequence.
+            mutation_codes (List[str]): Mutations as wild-type amino acid, position and mutant amino acid.
+            scoring_strategy (Literal["wt-marginals", "masked-marginals"], optional): Defaults to "wt-marginals".
+
+        Returns:
+            List[float]: The score of every mutation, higher meaning more likely than the wild-type.
+        """
+        mutations = [(code[0], int(code[1:-1]) - 1, code[-1]) for code in mutation_codes]
+        for wild_type, position, _mutant in mutations:
+            if position >= len(sequence) or sequence[position] != wild_type:
+                raise ValueError(f"The wild-type amino acid {wild_type} does not match the sequence at position {position + 1}.")
+
+        offset = int(self.alphabet.prepend_bos)
+        tokens = self._tokenize([sequence])
+
+        # Obtain the log-probabilities at every mutated position
+        if scoring_strategy == "wt-marginals":
+            log_probabilities = self._log_probabilities(tokens)[0]
+            position_log_probabilities = { position: log_probabilities[position + offset] for _, position, _ in mutations }
+        elif scoring_strategy == "masked-marginals":
+            positions = sorted(set(position for _, position, _ in mutations))
+            position_log_probabilities = {}
+            for batch_start in range(0, len(positions), self.batch_size):
+                batch_positions = positions[batch_start:batch_start + self.batch_size]
+                masked_tokens = tokens.repeat(len(batch_positions), 1)
+                for idx, position in enumerate(batch_positions):
+                    masked_tokens[idx, position + offset] = self.alphabet.mask_idx
+                log_probabilities = self._log_probabilities(masked_tokens)
+                for idx, position in enumerate(batch_positions):
+                    position_log_probabilities[position] = log_probabilities[idx, position + offset]
+        else:
+            raise NotImplementedError()
+
+        return [
+            (position_log_probabilities[position][self.alphabet.get_idx(mutant)] - position_log_probabilities[position][self.alphabet.get_idx(wild_type)]).item()
+            for wild_type, position, mutant in mutations
+        ]
+
+    def _format_output(self, sequence: str, return_type: ProteinPredictionReturnType) -> Union[str, Any]:
+        # Match the return types of `ESM3Model`, so that either can serve a task
+        if return_type == ProteinPredictionReturnType.STRING:
+            return sequence
+        return ESMProtein(sequence=sequence)
+
+    def __call__(
+        self,
+        task: ProteinPredictionTask,
+        protein: Union[str, Any],
+        return_type: ProteinPredictionReturnType = ProteinPredictionReturnType.STRING,
+        # Model-specific kwargs
+        mutation_codes: Optional[List[str]] = None,
+        scoring_strategy: Literal["wt-marginals", "masked-marginals"] = "wt-marginals",
+        # Kwargs specific to other models (e.g. `generation_config_kwargs`) are ignored
+        **kwargs,
+    ) -> Union[str, Any]:
+        sequence = protein if isinstance(protein, str) else protein.sequence
+
+        if task == ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION:
+            return self._format_output(self._complete_masked_sequences([sequence])[0], return_type)
+        elif task == ProteinPredictionTask.MUTATION_SCORING:
+            return self.score_mutations(sequence, mutation_codes, scoring_strategy)
+        else:
+            raise NotImplementedError()
+
+    def batch_call(
+        self,
+        task: ProteinPredictionTask,
+        proteins: List[Union[str, Any]],
+        return_type: ProteinPredictionReturnType = ProteinPredictionReturnType.STRING,
+        # Kwargs specific to other models (e.g. `generation_config_kwargs`) are ignored
+        **kwargs,
+    ) -> List[Union[str, Any]]:
+        sequences = [protein if isinstance(protein, str) else protein.sequence for protein in proteins]
+
+        if task == ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION:
+            return [self._format_output(sequence, return_type) for sequence in self._complete_masked_sequences(sequences)]
+        else:
+            raise NotImplementedError()
+
+    def supported_tasks(self) -> Set[ProteinPredictionTask]:
+        return set([
+            ProteinPredictionTask.MASKED_SEQUENCE_COMPLETION,
+            ProteinPredictionTask.MUTATION_SCORING,
+        ])
+
+class TieredProteinLanguageModel(BaseProteinLanguageModel):
+    def __init__(
+        self,
+        fast_model: BaseProteinLanguageModel,
+        full_model: Optional[BaseProteinLanguageModel] = None,
+        full_model_factory: Callable[[], BaseProteinLanguageModel] = ESM3Model,
+        escalated_tasks: Set[ProteinPredictionTask] = set([
+            ProteinPredictionTask.STRUCTURE_PREDICTION,
+            ProteinPredictionTask.INVERSE_FOLDING,
+        ]),
+    ):
+        """Send sequence-only tasks to a cheap model (e.g. `ESM2Model`), and escalate
+        `escalated_tasks`, or tasks the cheap model does not support, to a full model
+        (e.g. `ESM3Model`). The full model is only built on its first escalation.
+        """
+        self.fast_model = fast_model
+        self._full_model = full_model
+        self.full_model_factory = full_model_factory
+        self.escalated_tasks = escalated_tasks
+
+    @property
+    def full_model(self) -> BaseProteinLanguageModel:
+        if self._full_model is None:
+            self._full_model = self.full_model_factory()
+        return self._full_model
+
+    def route(self, task: ProteinPredictionTask) -> BaseProteinLanguageModel:
+        if task not in self.escalated_tasks and task in self.fast_model.supported_tasks():
+            return self.fast_model
+        return self.full_model
+
+    def __call__(
+        self,
+        task: ProteinPredictionTask,
+        protein: Union[str, Any],
+        return_type: ProteinPredictionReturnType = ProteinPredictionReturnType.STRING,
+        *args,
+        **kwargs,
+    ) -> Union[str, Any]:
+        return self.route(task)(task, protein, return_type, *args, **kwargs)
+
+    def batch_call(
+        self,
+        task: ProteinPredictionTask,
+        proteins: List[Union[str, Any]],
+        return_type: ProteinPredictionReturnType = ProteinPredictionReturnType.STRING,
+        *args,
+        **kwargs,
+    ) -> List[Union[str, Any]]:
+        return self.route(task).batch_call(task, proteins, return_type, *args, **kwargs)
+
+    def supported_tasks(self) -> Set[ProteinPredictionTask]:
+        return self.fast_model.supported_tasks() | self.escalated_tasks
+
 # class AlphaFold3Model(BaseProteinLanguageModel):
 #     def __init__(self, use_server: bool = True):
 #         self.use_server = use_server
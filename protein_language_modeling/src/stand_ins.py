@@ -0,0 +1,92 @@
+from typing import List, Sequence
+import torch
+from esm.data import Alphabet
+from esm.model.esm2 import ESM2
+from esm.sdk.api import ESMProtein, GenerationConfig
+from models import AMINO_ACIDS, ESM2Model
+
+class RandomESM3InferenceClient(torch.nn.Module):
+    """A small, randomly initialized stand-in for the ESM3 inference client.
+
+    It mirrors the `generate`/`batch_generate` interface used by `ESM3Model`
+    and does work that scales with sequence length, batch size and `num_steps`,
+    so that the surrounding code can be timed without the ESM3 weights.
+    """
+    def __init__(self, d_model: int = 64, n_layers: int = 2, n_heads: int = 4, seed: int = 0):
+        super(RandomESM3InferenceClient, self).__init__()
+        torch.manual_seed(seed)
+        self.embedding = torch.nn.Embedding(len(AMINO_ACIDS) + 2, d_model)
+        self.encoder = torch.nn.TransformerEncoder(
+            torch.nn.TransformerEncoderLayer(d_model, n_heads, dim_feedforward=2 * d_model, batch_first=True),
+            n_layers,
+        )
+        self.structure_head = torch.nn.Linear(d_model, 3 * 3)
+        self.plddt_head = torch.nn.Linear(d_model, 1)
+        self.sequence_head = torch.nn.Linear(d_model, len(AMINO_ACIDS))
+        self.eval()
+
+    def _tokenize(self, sequence: str) -> torch.Tensor:
+        # Unknown residues map to the second to last token, masks ('_') to the last
+        return torch.tensor([
+            len(AMINO_ACIDS) + 1 if residue == "_" else AMINO_ACIDS.find(residue) % (len(AMINO_ACIDS) + 1)
+            for residue in sequence
+        ])
+
+    @torch.no_grad()
+    def batch_generate(self, inputs: Sequence[ESMProtein], configs: Sequence[GenerationConfig]) -> List[ESMProtein]:
+        sequences = [
+            protein.sequence if protein.sequence is not None else "_" * len(protein.coordinates)
+            for protein in inputs
+        ]
+        max_length = max(len(sequence) for sequence in sequences)
+
+        tokens = torch.zeros((len(sequences), max_length), dtype=torch.long)
+        padding_mask = torch.ones((len(sequences), max_length), dtype=torch.bool)
+        for idx, sequence in enumerate(sequences):
+            tokens[idx, :len(sequence)] = self._tokenize(sequence)
+            padding_mask[idx, :len(sequence)] = False
+
+        # Iterative decoding: one encoder pass per step
+        hidden = self.embedding(tokens)
+        for _ in range(max(config.num_steps for config in configs)):
+            hidden = self.encoder(hidden, src_key_padding_mask=padding_mask)
+
+        outputs = []
+        for idx, (protein, config, sequence) in enumerate(zip(inputs, configs, sequences)):
+            length = len(sequence)
+            residue_hidden = hidden[idx, :length]
+
+            if config.track == "sequence":
+                predicted = "".join(AMINO_ACIDS[i] for i in self.sequence_head(residue_hidden).argmax(-1).tolist())
+                sequence = "".join(p if s == "_" else s for s, p in zip(sequence, predicted))
+
+            # Place the backbone atoms on an ideal helix, perturbed by the structure head
+            coordinates = torch.full((length, 37, 3), float("nan"))
+            residue_index = torch.arange(length, dtype=torch.float32)
+            angle = torch.deg2rad(100.0 * residue_index)
+            helix = torch.stack([2.3 * torch.cos(angle), 2.3 * torch.sin(angle), 1.5 * residue_index], dim=-1)
+            backbone = helix[:, None, :] + 0.1 * self.structure_head(residue_hidden).view(length, 3, 3)
+            backbone[:, 0] += torch.tensor([-0.8, -0.7, -1.2])
+            backbone[:, 2] += torch.tensor([-0.7, 0.8, 1.1])
+            coordinates[:, :3] = backbone
+
+            outputs.append(ESMProtein(
+                sequence=sequence,
+                coordinates=coordinates,
+                plddt=torch.sigmoid(self.plddt_head(residue_hidden)).squeeze(-1),
+            ))
+
+        return outputs
+
+    def generate(self, input: ESMProtein, config: GenerationConfig) -> ESMProtein:
+        return self.batch_generate([input], [config])[0]
+
+def random_esm2_model(num_layers: int = 2, embed_dim: int = 64, attention_heads: int = 4, seed: int = 0) -> ESM2Model:
+    """A small, randomly initialized `ESM2Model` that needs no checkpoint download."""
+    torch.manual_seed(seed)
+    alphabet = Alphabet.from_architecture("ESM-1b")
+    return ESM2Model(
+        model=ESM2(num_layers=num_layers, embed_dim=embed_dim, attention_heads=attention_heads, alphabet=alphabet),
+        alphabet=alphabet,
+        device="cpu",
+    )
@@ -2,12 +2,12 @@ from dataclasses import dataclass
 from enum import Enum
 import os
 import re
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple
 import py3Dmol
 import subprocess
 
 import requests
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 from esm.utils.structure.protein_chain import ProteinChain
 # from tmscoring import TMscoring
 
@@ -60,6 +60,63 @@ class ProteinAlignment:
     final_score: Optional[float]
     auxiliary: Optional[Any]
 
+USALIGN_TABULAR_COLUMNS = {
+    "#PDBchain1": str,
+    "PDBchain2": str,
+    "TM1": float,
+    "TM2": float,
+    "RMSD": float,
+    "ID1": float,
+    "ID2": float,
+    "IDali": float,
+    "L1": int,
+    "L2": int,
+    "Lali": int,
+}
+
+USALIGN_BATCH_OPTIONS = "-ter 1 -outfmt 2"
+"""USalign options of `ProteinComparator.compute_scores_batch`. Unlike the pairwise
+`-mm 1 -ter 0` (multimer) alignment, this aligns chains individually."""
+
+def parse_usalign_tabular_output(printed_stdout: str) -> List[Dict[str, Any]]:
+    """Parse the `-outfmt 2` output of USalign/TMalign into typed rows.
+
+    Args:
+        printed_stdout (str): The stdout of a USalign run with `-outfmt 2`.
+
+    Returns:
+        List[Dict[str, Any]]: One row per aligned chain pair, keyed by the
+            tabular header (with the leading `#` dropped from `PDBchain1`).
+    """
+    rows = []
+
+    for line in printed_stdout.splitlines():
+        fields = line.strip().split("\t")
+
+        # Skip the header, the trailing CPU time and any warnings
+        if line.startswith("#") or len(fields) != len(USALIGN_TABULAR_COLUMNS):
+            continue
+
+        row = {}
+        for (column, column_type), value in zip(USALIGN_TABULAR_COLUMNS.items(), fields):
+            row[column.lstrip("#")] = column_type(value)
+        rows.append(row)
+
+    return rows
+
+def best_usalign_rows_by_structure(rows: List[Dict[str, Any]], num_structures: int) -> List[Optional[Dict[str, Any]]]:
+    """Map the rows of a `-dir1` batch back to the predicted structures, which are
+    written as `<index>.pdb`. Each structure keeps the reference chain it aligns best
+    to (normalized by the predicted structure), or `None` if USalign did not score it.
+    """
+    best_rows: List[Optional[Dict[str, Any]]] = [None] * num_structures
+    for row in rows:
+        idx = int(os.path.basename(row["PDBchain1"]).split(":")[0].split(".")[0])
+        if best_rows[idx] is None or row["TM1"] > best_rows[idx]["TM1"]:
+            best_rows[idx] = row
+
+    return best_rows
+
 class ProteinComparator:
     def __init__(
         self,
@@ -156,6 +213,112 @@ class ProteinComparator:
         # and the output to stdout
         return (output_file_contents, result.stdout)
 
+    def _run_usalign_batch(
+        self,
+        predicted_pdbs: List[str],
+        reference_pdb: str,
+        run_command_template: str = "./USalign " + USALIGN_BATCH_OPTIONS + " -dir1 {}/ {} {}",
+    ) -> List[Optional[Dict[str, Any]]]:
+        # Write every predicted structure of the chunk into a
+        # scratch directory with a chain list, and the shared
+        # reference structure next to it, exactly once
+        with TemporaryDirectory() as scratch_dir:
+            chain_list_filename = os.path.join(scratch_dir, "chain_list")
+            reference_filename = os.path.join(scratch_dir, "reference.pdb")
+            structures_dir = os.path.join(scratch_dir, "structures")
+            os.makedirs(structures_dir)
+
+            with open(chain_list_filename, "w") as chain_list_file:
+                for idx, pdb in enumerate(predicted_pdbs):
+                    with open(os.path.join(structures_dir, f"{idx}.pdb"), "w") as pdb_file:
+                        pdb_file.write(pdb)
+                    chain_list_file.write(f"{idx}.pdb\n")
+
+            with open(reference_filename, "w") as reference_file:
+                reference_file.write(reference_pdb)
+
+            # Run a single USalign process for the whole chunk
+            command = run_command_template.format(structures_dir, chain_list_filename, reference_filename).split(" ")
+            result = subprocess.run(
+                command,
+                capture_output=True,
+                text=True
+            )
+
+        # Do not mistake a rejected command or a crash for unscorable pairs
+        if result.returncode != 0:
+            raise RuntimeError(f"USalign exited with code {result.returncode}: {result.stderr.strip()}")
+
+        return best_usalign_rows_by_structure(parse_usalign_tabular_output(result.stdout), len(predicted_pdbs))
+
+    def compute_scores_batch(
+        self,
+        pdb_pairs: List[Tuple[str, str]],
+        chunk_size: int = 256,
+    ) -> List[Optional[ProteinAlignment]]:
+        """Score many (predicted, ground truth) PDB pairs with as few USalign
+        processes as possible. Pairs sharing a ground truth PDB (e.g. many
+        mutants against one wild-type) are grouped, and each group is scored
+        with one USalign invocation per `chunk_size` predicted structures.
+
+        NOTE: The scores are not interchangeable with `compute_score_and_alignment`.
+        USalign does not accept directory inputs in multimer mode (`-mm 1 -ter 0`),
+        so the batch runs in chain mode (`USALIGN_BATCH_OPTIONS`): every chain of the
+        ground truth is aligned separately, and the best TM-score normalized by the
+        predicted structure is kept. For multi-chain or multi-model ground truths (e.g.
+        RCSB wild-type PDBs), this differs from the pairwise multimer TM-score. The
+        options used are recorded under `usalign_options` in `auxiliary`.
+
+        USalign does not write superimposed structures in batch mode either,
+        so `superimposed_pdb` is always `None` on the returned alignments.
+        Use `compute_score_and_alignment` for pairs that need to be visualized.
+
+        Args:
+            pdb_pairs (List[Tuple[str, str]]): Predicted and ground truth protein PDB representations.
+            chunk_size (int, optional): Maximum number of predicted PDBs per USalign process. Defaults to 256.
+
+        Returns:
+            List[Optional[ProteinAlignment]]: US-Align alignments in the order of `pdb_pairs`,
+                with `None` for any pair USalign could not score.
+
+        Raises:
+            RuntimeError: If a USalign process exits with a non-zero code.
+        """
+        if self.method != ProteinComparatorMethod.US_ALIGN:
+            raise NotImplementedError()
+
+        # Group the pairs by their ground truth PDB
+        pair_indices_by_reference: Dict[str, List[int]] = {}
+        for pair_idx, (_pdb1, pdb2) in enumerate(pdb_pairs):
+            pair_indices_by_reference.setdefault(pdb2, []).append(pair_idx)
+
+        results: List[Optional[ProteinAlignment]] = [None] * len(pdb_pairs)
+
+        for reference_pdb, pair_indices in pair_indices_by_reference.items():
+            for chunk_start in range(0, len(pair_indices), chunk_size):
+                chunk_indices = pair_indices[chunk_start:chunk_start + chunk_size]
+                rows = self._run_usalign_batch(
+                    [pdb_pairs[pair_idx][0] for pair_idx in chunk_indices],
+                    reference_pdb,
+                )
+
+                for pair_idx, row in zip(chunk_indices, rows):
+                    if row is None:
+                        continue
+
+                    results[pair_idx] = ProteinAlignment(
+                        method=ProteinComparatorMethod.US_ALIGN,
+                        pdb1=pdb_pairs[pair_idx][0],
+                        pdb2=reference_pdb,
+                        superimposed_pdb=None,
+                        score1=row["TM1"],
+                        score2=row["TM2"],
+                        final_score=row["TM1"],
+                        auxiliary={ **row, "usalign_options": USALIGN_BATCH_OPTIONS },
+                    )
+
+        return results
+
     def _run_score_alignment_algorithms(self, pdb1: str, pdb2: str) -> List[ProteinAlignment]:
         results = []
 